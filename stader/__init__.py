@@ -1,5 +1,6 @@
-__all__ = ["mechanics", "derivatives", "controls"]
+__all__ = ["mechanics", "derivatives", "controls", "feedback"]
 
 from .mechanics import *
 from .derivatives import *
 from .controls import *
+from .feedback import *
@@ -1,3 +1,5 @@
+import numpy as np
+
 __all__ = ['ControlSurface', 'ControlSurfaceSecondOrder']
 
 
@@ -16,8 +18,46 @@ class ControlSurface(object):
         self.rate = rate
         self.commanded = commanded
 
+    def update_multirate(self, dt, commanded, substeps=1, interpolate=False):
+        """
+        Step dt as `substeps` substeps, holding or ramping the command, and
+        return the mean angle over the frame.
+        """
+        angle = self.angle
+        previous = self.commanded
+        sub_dt = dt/substeps
+
+        if type(self).update is ControlSurface.update and substeps > 1:
+            # Ideal surface: the angle follows the command, so the state
+            # before the last substep is known in closed form
+            if interpolate:
+                step = (commanded-previous)/substeps
+                rate = -step/sub_dt
+                total = (substeps-1)*(previous + 0.5*(commanded-previous))
+            else:
+                step = 0.0
+                rate = (previous-commanded)/sub_dt if substeps == 2 else 0.0
+                total = (substeps-1)*commanded
+            self.commanded = commanded - step
+            self.rate = rate
+            self.update(sub_dt, commanded)
+            return (0.5*angle + total + 0.5*self.angle)/substeps
+
+        total = 0.5*angle
+        for i in range(1, substeps+1):
+            if interpolate:
+                c = previous + (commanded-previous)*i/substeps
+            else:
+                c = commanded
+            self.update(sub_dt, c)
+            total += self.angle
+        return (total - 0.5*self.angle)/substeps
+
 
 class ControlSurfaceSecondOrder(ControlSurface):
+    _max_propagators = 16
+    _min_fused_substeps = 4
+
     def __init__(self, natural_frequency, damping, rate_limit=None, displacement_limit=None):
         self.natural_frequency = natural_frequency
         self.damping = damping
@@ -28,6 +68,7 @@ class ControlSurfaceSecondOrder(ControlSurface):
         self.angle = 0.0
         self.rate = 0.0
         self.acceleration = 0.0
+        self._propagators = {}
 
     def update(self, dt, commanded):
         drate = self.rate
@@ -45,3 +86,59 @@ class ControlSurfaceSecondOrder(ControlSurface):
         self.angle += self.rate*dt
         if self.displacement_limit is not None:
             self.angle = max(min(self.angle, self.displacement_limit), -self.displacement_limit)
+
+    def update_multirate(self, dt, commanded, substeps=1, interpolate=False):
+        """
+        As ControlSurface.update_multirate, with the substeps fused into one
+        precomputed propagation where that is exact and worthwhile.
+        """
+        M = None
+        if (type(self).update is ControlSurfaceSecondOrder.update
+                and self.rate_limit is None and self.displacement_limit is None
+                and substeps >= ControlSurfaceSecondOrder._min_fused_substeps):
+            M = self._propagator(dt/substeps, substeps)
+        if M is None:
+            return super(ControlSurfaceSecondOrder, self).update_multirate(
+                dt, commanded, substeps, interpolate)
+
+        angle = self.angle
+        previous = self.commanded
+        if interpolate:
+            step = (commanded-previous)/substeps
+        else:
+            previous, step = commanded, 0.0
+        z = M.dot((self.angle, self.rate, previous, step, 0.0))
+        self.angle = z[0]
+        self.rate = z[1]
+        self.update(dt/substeps, commanded)
+        return (0.5*angle + z[4] + 0.5*self.angle)/substeps
+
+    def _propagator(self, sub_dt, substeps):
+        """
+        Cached matrix taking [angle, rate, command, step, angle sum] through
+        substeps-1 substeps, or None the first time a step size is seen.
+        """
+        key = (sub_dt, substeps, self.natural_frequency, self.damping)
+        if key not in self._propagators:
+            if len(self._propagators) >= ControlSurfaceSecondOrder._max_propagators:
+                self._propagators.clear()
+            self._propagators[key] = None
+            return None
+        M = self._propagators[key]
+        if M is not None:
+            return M
+
+        wn2 = self.natural_frequency**2
+        c = 1 - 2*self.natural_frequency*self.damping*sub_dt
+        # One substep of update() on z = [angle rate command step sum]
+        rate = np.array((-wn2*sub_dt, c, wn2*sub_dt, wn2*sub_dt, 0))
+        step = np.array(((1, 0, 0, 0, 0),
+                         rate,
+                         (0, 0, 1, 1, 0),
+                         (0, 0, 0, 1, 0),
+                         (0, 0, 0, 0, 1)), dtype=float)
+        step[0] += sub_dt*rate
+        step[4] += step[0]
+        M = np.linalg.matrix_power(step, substeps-1)
+        self._propagators[key] = M
+        return M
@@ -0,0 +1,167 @@
+import numpy as np
+import scipy.signal
+from .mechanics import AircraftDynamics
+
+
+__all__ = ["lqr", "place", "clear_cache"]
+
+
+_gain_cache = {}
+_max_gains = 1024
+_max_iterations = 100
+_tolerance = 1e-12
+
+
+def lqr(models, Q, R, dt=None):
+    """
+    Design LQR state-feedback gains K for u = -K x.
+
+    `models` is an AircraftDynamics (e.g. AircraftLateral) or a sequence of
+    them, one per flight condition, in which case K is a new (N, m, n) stack
+    and the Riccati equations for all conditions are solved together. If dt
+    is given the gains are designed for the model as it is stepped, with Q
+    and R weighting each step; otherwise they are continuous-time. Gains
+    are cached by model, weights and dt, and are returned read-only.
+    """
+    Q = np.atleast_2d(np.asarray(Q, dtype=float))
+    R = np.atleast_2d(np.asarray(R, dtype=float))
+    key = ('lqr', _array_key(Q), _array_key(R), dt)
+    return _design(models, key, lambda A, B: _lqr(A, B, Q, R, dt))
+
+
+def place(models, poles):
+    """
+    Design state-feedback gains K for u = -K x placing the continuous-time
+    closed-loop poles.
+
+    `models` is an AircraftDynamics or a sequence of them, as for lqr().
+    Pole placement is not batched: each uncached condition is solved on
+    its own with scipy.signal.place_poles. Gains are cached by model and
+    poles, and are returned read-only.
+    """
+    poles = np.asarray(poles)
+    key = ('place', _array_key(poles))
+    return _design(models, key, lambda A, B: np.array(
+        [scipy.signal.place_poles(a, b, poles).gain_matrix for a, b in zip(A, B)]))
+
+
+def clear_cache():
+    """
+    Forget all gains designed by lqr() and place().
+    """
+    _gain_cache.clear()
+
+
+def _lqr(A, B, Q, R, dt):
+    Bt = B.transpose(0, 2, 1)
+    if dt is None:
+        P = _solve_care(A, np.matmul(B, np.linalg.solve(R, Bt)), Q)
+        return np.linalg.solve(R, np.matmul(Bt, P))
+    # Euler step used by AircraftDynamics.update: x' = (I + dt A) x + dt B u
+    Ad = np.identity(A.shape[-1]) + dt*A
+    Bd = dt*B
+    Bdt = Bd.transpose(0, 2, 1)
+    P = _solve_dare(Ad, np.matmul(Bd, np.linalg.solve(R, Bdt)), Q)
+    return np.linalg.solve(R + np.matmul(np.matmul(Bdt, P), Bd),
+                           np.matmul(np.matmul(Bdt, P), Ad))
+
+
+def _solve_dare(A, G, Q):
+    """
+    Solve stacked discrete algebraic Riccati equations, G = B R^-1 B^T, by
+    the structured doubling algorithm.
+    """
+    I = np.identity(A.shape[-1])
+    H = np.broadcast_to(Q, A.shape)
+    for i in range(_max_iterations):
+        W = I + np.matmul(G, H)
+        WA = np.linalg.solve(W, A)
+        WG = np.linalg.solve(W, G)
+        At = A.transpose(0, 2, 1)
+        H_next = H + np.matmul(np.matmul(At, H), WA)
+        G = G + np.matmul(np.matmul(A, WG), At)
+        A = np.matmul(A, WA)
+        if _converged(H, H_next):
+            return _symmetric(H_next)
+        H = H_next
+    raise np.linalg.LinAlgError('Riccati iteration did not converge')
+
+
+def _solve_care(A, G, Q):
+    """
+    Solve stacked continuous algebraic Riccati equations, G = B R^-1 B^T,
+    with the matrix sign function of the Hamiltonian.
+    """
+    n = A.shape[-1]
+    Z = np.concatenate((np.concatenate((A, -G), axis=2),
+                        np.concatenate((-np.broadcast_to(Q, A.shape),
+                                        -A.transpose(0, 2, 1)), axis=2)), axis=1)
+    for i in range(_max_iterations):
+        # Determinant scaling for fast convergence
+        c = np.abs(np.linalg.det(Z))**(-0.5/n)
+        c = c[:, np.newaxis, np.newaxis]
+        Z_next = 0.5*(c*Z + np.linalg.inv(Z)/c)
+        if _converged(Z, Z_next):
+            break
+        Z = Z_next
+    else:
+        raise np.linalg.LinAlgError('Riccati iteration did not converge')
+
+    # P is the least-squares solution of [W12; W22+I] P = -[W11+I; W21]
+    I = np.identity(n)
+    M = np.concatenate((Z_next[:, :n, n:], Z_next[:, n:, n:] + I), axis=1)
+    N = -np.concatenate((Z_next[:, :n, :n] + I, Z_next[:, n:, :n]), axis=1)
+    Mt = M.transpose(0, 2, 1)
+    return _symmetric(np.linalg.solve(np.matmul(Mt, M), np.matmul(Mt, N)))
+
+
+def _converged(X, X_next):
+    change = np.linalg.norm(X_next - X, axis=(1, 2))
+    return np.all(change <= _tolerance*np.linalg.norm(X_next, axis=(1, 2)))
+
+
+def _symmetric(X):
+    return 0.5*(X + X.transpose(0, 2, 1))
+
+
+def _design(models, key, design):
+    """
+    Look up each model's gain in the cache and design all the missing ones
+    in one call on stacked A and B.
+    """
+    single = isinstance(models, AircraftDynamics)
+    if single:
+        models = [models]
+    if len(models) == 0:
+        raise ValueError('no models to design gains for')
+    keys = [(_array_key(model._A), _array_key(model._B)) + key for model in models]
+
+    gains = {}
+    missing = {}
+    for model, model_key in zip(models, keys):
+        if model_key in _gain_cache:
+            gains[model_key] = _gain_cache[model_key]
+        else:
+            missing[model_key] = model
+    if missing:
+        missing_keys = list(missing)
+        A = np.array([missing[k]._A for k in missing_keys], dtype=float)
+        B = np.array([missing[k]._B for k in missing_keys], dtype=float)
+        for model_key, K in zip(missing_keys, design(A, B)):
+            K = np.array(K, dtype=float)
+            K.setflags(write=False)
+            if len(_gain_cache) >= _max_gains:
+                _gain_cache.clear()
+            _gain_cache[model_key] = K
+            gains[model_key] = K
+
+    if single:
+        return gains[keys[0]]
+    K = np.array([gains[k] for k in keys])
+    K.setflags(write=False)
+    return K
+
+
+def _array_key(array):
+    array = np.ascontiguousarray(array)
+    return (array.shape, array.dtype.str, array.tobytes())
@@ -1,15 +1,32 @@
+import copy
 import numpy as np
 import scipy.signal
 from .controls import ControlSurface
 
 __all__ = ["Aircraft", "AircraftLateral", "AircraftLongitudinal"]
 
+# Default for arguments where None has a meaning of its own
+_unchanged = object()
+
 class Aircraft(object):
     _lat_attr = ['p', 'r', 'yaw', 'roll', 'v', 'y']
     _long_attr = ['q', 'pitch', 'u', 'w', 'x', 'z']
     _controls = ['elevator', 'thrust', 'aileron', 'rudder']
-
-    def __init__(self, derivatives, controls={}):
+    _control_state = ['angle', 'rate', 'acceleration', 'commanded']
+
+    # x = [ dv dp dr dphi dpsi dy ], [ du dw dq dtheta dz ], along-track x,
+    # and [ angle rate acceleration commanded ] for each of _controls
+    state_dtype = np.dtype([('lateral', np.float64, (6,)),
+                            ('longitudinal', np.float64, (5,)),
+                            ('x', np.float64),
+                            ('controls', np.float64, (len(_controls), len(_control_state)))])
+
+    def __init__(self, derivatives, controls={}, actuators=False):
+        """
+        With `actuators` set, the rigid body is driven by the mean control
+        surface angles over each frame instead of the commands.
+        """
+        self.actuators = actuators
         self.lateral = AircraftLateral(derivatives)
         self.longitudinal = AircraftLongitudinal(derivatives)
 
@@ -29,25 +46,117 @@ class Aircraft(object):
             setattr(self, attr, getattr(self.longitudinal, attr))
 
 
+    def set_feedback(self, lateral=_unchanged, longitudinal=_unchanged):
+        """
+        Set the gains of the axes passed, so update() inputs become references
+        r and the surfaces are commanded with u = -K x + r; None opens a loop.
+        """
+        if lateral is not _unchanged:
+            self.lateral.set_feedback(lateral)
+        if longitudinal is not _unchanged:
+            self.longitudinal.set_feedback(longitudinal)
+
+
     def update(self, dt, inputs={}):
-        ulat = np.zeros(self.lateral._n_inputs)
-        ulong = np.zeros(self.longitudinal._n_inputs)
+        self.update_multirate(dt, inputs)
+
+
+    def update_multirate(self, dt, inputs={}, substeps=1, interpolate=False):
+        """
+        Step the control surfaces at dt/substeps and the rigid body, and any
+        feedback, once at dt; update() is the substeps=1 case.
+        """
+        ulong = np.array((inputs.get('elevator', 0.0), inputs.get('thrust', 0.0)))
+        ulat = np.array((inputs.get('aileron', 0.0), inputs.get('rudder', 0.0)))
+        clong = self.longitudinal.total_input(ulong)
+        clat = self.lateral.total_input(ulat)
+        commands = {'elevator': clong[0], 'thrust': clong[1],
+                    'aileron': clat[0], 'rudder': clat[1]}
+        angles = {}
         for control in Aircraft._controls:
-            if control not in inputs:
-                inputs[control] = 0.0
-            getattr(self, control).update(dt, inputs[control])
+            angles[control] = getattr(self, control).update_multirate(
+                dt, commands[control], substeps, interpolate)
 
-        ulong[0] = inputs['elevator']
-        ulong[1] = inputs['thrust']
-        ulat[0] = inputs['aileron']
-        ulat[1] = inputs['rudder']
+        if self.actuators:
+            clong = np.array((angles['elevator'], angles['thrust']))
+            clat = np.array((angles['aileron'], angles['rudder']))
+        self.lateral.update(dt, clat, feedback=False)
+        self.longitudinal.update(dt, clong, feedback=False)
 
-        self.lateral.update(dt, ulat)
-        self.longitudinal.update(dt, ulong)
+        self._update_attr()
 
+
+    def snapshot(self, out=None):
+        """
+        Return the mutable state as a record of dtype Aircraft.state_dtype.
+
+        Pass `out` (e.g. one element of an array of records) to write into
+        it instead of allocating.
+        """
+        if out is None:
+            out = np.zeros((), dtype=Aircraft.state_dtype)
+        out['lateral'] = self.lateral._x
+        out['longitudinal'] = self.longitudinal._x
+        out['x'] = self.longitudinal.x
+        controls = out['controls']
+        for i, control in enumerate(Aircraft._controls):
+            surface = getattr(self, control)
+            for j, attr in enumerate(Aircraft._control_state):
+                controls[i, j] = getattr(surface, attr)
+        return out
+
+
+    def restore(self, state):
+        """
+        Restore the mutable state from a record produced by snapshot().
+        """
+        self.lateral._x[:] = state['lateral']
+        self.longitudinal._x[:] = state['longitudinal']
+        self.longitudinal.x = float(state['x'])
+        controls = state['controls']
+        for i, control in enumerate(Aircraft._controls):
+            surface = getattr(self, control)
+            for j, attr in enumerate(Aircraft._control_state):
+                setattr(surface, attr, float(controls[i, j]))
+
+        self.lateral._update_attr()
+        self.longitudinal._update_attr()
         self._update_attr()
 
 
+    def fork(self, state=None):
+        """
+        Return a new Aircraft with its own mutable state, sharing the
+        derivatives and model matrices with this one.
+
+        The fork starts from the current state, or from `state` if given.
+        """
+        other = Aircraft.__new__(Aircraft)
+        other.__dict__.update(self.__dict__)
+        other.lateral = self.lateral.fork()
+        other.longitudinal = self.longitudinal.fork()
+        for control in Aircraft._controls:
+            setattr(other, control, copy.copy(getattr(self, control)))
+
+        if state is not None:
+            other.restore(state)
+        else:
+            other._update_attr()
+        return other
+
+
+    def fork_many(self, states):
+        """
+        Return a list of forks, one per record in an array of
+        Aircraft.state_dtype records (e.g. filled by snapshot(out=...)).
+
+        The package has no batched stepper; the forks are stepped one by
+        one, and records are the way to gather or scatter their states.
+        """
+        states = np.asarray(states, dtype=Aircraft.state_dtype).reshape(-1)
+        return [self.fork(state) for state in states]
+
+
     def __getattr__(self, attr):
         if hasattr(self.lateral, attr):
             return self.lateral.__getattribute__(attr)
@@ -70,15 +179,58 @@ class AircraftDynamics(object):
             x0 = np.zeros(self._n_states)
         self._x = x0
         self._xdot = np.zeros(self._n_states)
-
-
-    def update(self, dt, u=None):
+        self._K = None
+        self._A_cl = None
+
+
+    def set_feedback(self, K=None):
+        """
+        Close the loop with u = -K x + r, so update() takes the reference r;
+        None opens it.
+        """
+        if K is None:
+            self._K = None
+            self._A_cl = None
+            return
+        K = np.asarray(K, dtype=float)
+        if K.shape != (self._n_inputs, self._n_states):
+            raise ValueError('K must have shape ({}, {}), got {}'.format(
+                self._n_inputs, self._n_states, K.shape))
+        self._K = K
+        self._A_cl = self._A - self._B.dot(self._K)
+
+
+    def total_input(self, u):
+        """
+        Return the input applied for reference u, -K x + u if feedback is set.
+        """
+        u = np.asarray(u, dtype=float)
+        if self._K is None:
+            return u
+        return u - self._K.dot(self._x)
+
+
+    def update(self, dt, u=None, feedback=True):
         if u is None:
             u = np.zeros(self._n_inputs)
-        self._xdot = dt*(self._A.dot(self._x) + self._B.dot(u))
+        if feedback and self._K is not None:
+            A = self._A_cl
+        else:
+            A = self._A
+        self._xdot = dt*(A.dot(self._x) + self._B.dot(u))
         self._x += self._xdot
 
 
+    def fork(self):
+        """
+        Return a copy with its own state vector that shares A and B.
+        """
+        other = copy.copy(self)
+        other._x = self._x.copy()
+        other._xdot = self._xdot.copy()
+        return other
+
+
     def lti(self, C=None, D=None):
         if C is None:
             C = np.identity(self._n_states)
@@ -111,8 +263,8 @@ class AircraftLateral(AircraftDynamics):
         self._update_attr()
 
 
-    def update(self, dt, u=None):
-        super(AircraftLateral, self).update(dt, u)
+    def update(self, dt, u=None, feedback=True):
+        super(AircraftLateral, self).update(dt, u, feedback)
         self._update_attr()
 
 
@@ -156,8 +308,8 @@ class AircraftLongitudinal(AircraftDynamics):
         self.x = 0.0
 
 
-    def update(self, dt, u=None):
-        super(AircraftLongitudinal, self).update(dt, u)
+    def update(self, dt, u=None, feedback=True):
+        super(AircraftLongitudinal, self).update(dt, u, feedback)
         self._update_attr()
         self.x += (self.u + self.U0)*dt
 
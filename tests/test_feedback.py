@@ -0,0 +1,152 @@
+import copy
+
+import numpy as np
+import pytest
+import scipy.linalg
+
+import stader
+
+
+def models(n=5):
+    derivatives = stader.load_aircraft('b747_flight_condition2')
+    result = []
+    for scale in np.linspace(0.8, 1.2, n):
+        d = copy.deepcopy(derivatives)
+        d['U0'] *= scale
+        result.append(stader.AircraftLateral(d))
+    return result
+
+
+def scipy_lqr(model, Q, R, dt):
+    A, B = model._A, model._B
+    if dt is None:
+        P = scipy.linalg.solve_continuous_are(A, B, Q, R)
+        return np.linalg.solve(R, B.T.dot(P))
+    Ad = np.identity(A.shape[0]) + dt*A
+    Bd = dt*B
+    P = scipy.linalg.solve_discrete_are(Ad, Bd, Q, R)
+    return np.linalg.solve(R + Bd.T.dot(P).dot(Bd), Bd.T.dot(P).dot(Ad))
+
+
+@pytest.mark.parametrize('dt', [None, 0.02])
+def test_lqr_matches_scipy_and_stabilizes(dt):
+    lateral = models()
+    Q = np.identity(6)
+    R = np.identity(2)
+    K = stader.lqr(lateral, Q, R, dt)
+    assert K.shape == (len(lateral), 2, 6)
+    for model, gain in zip(lateral, K):
+        np.testing.assert_allclose(gain, scipy_lqr(model, Q, R, dt), rtol=1e-8, atol=1e-8)
+        A_cl = model._A - model._B.dot(gain)
+        if dt is None:
+            assert np.linalg.eigvals(A_cl).real.max() < 0
+        else:
+            assert np.abs(np.linalg.eigvals(np.identity(6) + dt*A_cl)).max() < 1
+
+
+def test_lqr_is_cached():
+    model = models(1)[0]
+    K = stader.lqr(model, np.identity(6), np.identity(2), 0.02)
+    assert stader.lqr(model, np.identity(6), np.identity(2), 0.02) is K
+    assert stader.lqr(model, 2*np.identity(6), np.identity(2), 0.02) is not K
+    assert not K.flags.writeable
+
+
+def test_place_poles():
+    poles = [-1, -2, -3, -4, -5, -6]
+    lateral = models(2)
+    for model, gain in zip(lateral, stader.place(lateral, poles)):
+        eigvals = np.linalg.eigvals(model._A - model._B.dot(gain))
+        np.testing.assert_allclose(np.sort(eigvals.real), np.sort(poles), rtol=1e-6)
+
+
+def test_set_feedback_rejects_stacked_gains():
+    lateral = models(2)
+    K = stader.lqr(lateral, np.identity(6), np.identity(2))
+    with pytest.raises(ValueError):
+        lateral[0].set_feedback(K)
+    with pytest.raises(ValueError):
+        lateral[0].set_feedback(K[:1])
+
+
+def test_closed_loop_matches_explicit_feedback():
+    dt = 0.02
+    aircraft = stader.Aircraft(stader.load_aircraft('b747_flight_condition2'))
+    K = stader.lqr(aircraft.lateral, np.identity(6), np.identity(2), dt)
+    aircraft.lateral._x[:] = [1, 0.1, 0, 0.05, 0, 0]
+    reference = aircraft.lateral.fork()
+    reference.set_feedback(K)
+    aircraft.set_feedback(lateral=K)
+    for i in range(100):
+        aircraft.update(dt)
+        reference.update(dt)
+    np.testing.assert_allclose(aircraft.lateral._x, reference._x, atol=1e-12)
+
+
+def test_aircraft_set_feedback_changes_only_given_axes():
+    aircraft = stader.Aircraft(stader.load_aircraft('b747_flight_condition2'))
+    aircraft.set_feedback(longitudinal=np.zeros((2, 5)))
+    aircraft.set_feedback(lateral=np.zeros((2, 6)))
+    assert aircraft.longitudinal._K is not None
+    aircraft.set_feedback(longitudinal=None)
+    assert aircraft.longitudinal._K is None
+    assert aircraft.lateral._K is not None
+
+
+def test_stacked_gains_are_read_only():
+    K = stader.lqr(models(2), np.identity(6), np.identity(2))
+    assert K.shape == (2, 2, 6)
+    assert not K.flags.writeable
+    with pytest.raises(ValueError):
+        stader.lqr([], np.identity(6), np.identity(2))
+
+
+def test_gain_cache_is_bounded_and_clearable(monkeypatch):
+    monkeypatch.setattr(stader.feedback, '_max_gains', 3)
+    stader.clear_cache()
+    assert len(stader.feedback._gain_cache) == 0
+    for model in models(5):
+        stader.lqr(model, np.identity(6), np.identity(2))
+        assert len(stader.feedback._gain_cache) <= 3
+    K = stader.lqr(models(5), np.identity(6), np.identity(2))
+    assert K.shape == (5, 2, 6)
+    assert len(stader.feedback._gain_cache) <= 3
+    stader.clear_cache()
+    assert len(stader.feedback._gain_cache) == 0
+
+
+def riccati_residual(model, P, Q, R, dt):
+    A, B = model._A, model._B
+    if dt is None:
+        return A.T.dot(P) + P.dot(A) - P.dot(B).dot(np.linalg.solve(R, B.T.dot(P))) + Q
+    Ad = np.identity(A.shape[0]) + dt*A
+    Bd = dt*B
+    return (Ad.T.dot(P).dot(Ad) - P + Q
+            - Ad.T.dot(P).dot(Bd).dot(np.linalg.solve(R + Bd.T.dot(P).dot(Bd), Bd.T.dot(P).dot(Ad))))
+
+
+@pytest.mark.parametrize('dt', [None, 0.02, 0.001])
+def test_lqr_longitudinal(dt):
+    # P is ill-conditioned (condition number ~1e9) here, so the gains are
+    # compared loosely and the Riccati residual is checked instead
+    model = stader.AircraftLongitudinal(stader.load_aircraft('b747_flight_condition2'))
+    Q = np.identity(5)
+    R = np.identity(2)
+    A, B = model._A[np.newaxis], model._B[np.newaxis]
+    if dt is None:
+        G = np.matmul(B, np.linalg.solve(R, B.transpose(0, 2, 1)))
+        P = stader.feedback._solve_care(A, G, Q)[0]
+    else:
+        Ad = np.identity(5) + dt*A
+        Bd = dt*B
+        G = np.matmul(Bd, np.linalg.solve(R, Bd.transpose(0, 2, 1)))
+        P = stader.feedback._solve_dare(Ad, G, Q)[0]
+    assert np.abs(riccati_residual(model, P, Q, R, dt)).max() < 1e-9*np.abs(P).max()
+
+    K = stader.lqr(model, Q, R, dt)
+    np.testing.assert_allclose(K, scipy_lqr(model, Q, R, dt), rtol=1e-4, atol=1e-4*np.abs(K).max())
+    A_cl = model._A - model._B.dot(K)
+    if dt is None:
+        assert np.linalg.eigvals(A_cl).real.max() < 0
+    else:
+        assert np.abs(np.linalg.eigvals(np.identity(5) + dt*A_cl)).max() < 1
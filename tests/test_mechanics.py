@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+import stader
+
+
+def load():
+    return stader.load_aircraft('b747_flight_condition2')
+
+
+@pytest.mark.parametrize('actuators', [False, True])
+def test_aircraft_update_is_single_substep_multirate(actuators):
+    def make():
+        return stader.Aircraft(load(),
+                               {'elevator': stader.ControlSurfaceSecondOrder(30, 0.7),
+                                'aileron': stader.ControlSurfaceSecondOrder(30, 0.7)},
+                               actuators=actuators)
+    a = make()
+    b = make()
+    for i in range(50):
+        a.update(0.02, {'elevator': 0.01, 'aileron': 0.02})
+        b.update_multirate(0.02, {'elevator': 0.01, 'aileron': 0.02}, 1)
+    assert np.array_equal(a.lateral._x, b.lateral._x)
+    assert np.array_equal(a.longitudinal._x, b.longitudinal._x)
+
+
+def flown_aircraft():
+    aircraft = stader.Aircraft(load(), {'elevator': stader.ControlSurfaceSecondOrder(30, 0.7)})
+    for i in range(20):
+        aircraft.update(0.02, {'elevator': 0.01, 'aileron': 0.02})
+    return aircraft
+
+
+def test_snapshot_restore_round_trip():
+    aircraft = flown_aircraft()
+    state = aircraft.snapshot()
+    pitch, x, elevator = aircraft.pitch, aircraft.x, aircraft.elevator.angle
+    for i in range(20):
+        aircraft.update(0.02, {'rudder': 0.1})
+    aircraft.restore(state)
+    assert aircraft.snapshot() == state
+    assert (aircraft.pitch, aircraft.x, aircraft.elevator.angle) == (pitch, x, elevator)
+
+
+def test_fork_is_isolated_and_shares_model():
+    aircraft = flown_aircraft()
+    state = aircraft.snapshot()
+    fork = aircraft.fork()
+    assert fork.lateral._A is aircraft.lateral._A
+    assert fork.longitudinal._B is aircraft.longitudinal._B
+    assert fork.lateral._x is not aircraft.lateral._x
+    assert fork.elevator is not aircraft.elevator
+
+    for i in range(20):
+        fork.update(0.02, {'elevator': -0.05, 'rudder': 0.1})
+    assert aircraft.snapshot() == state
+    assert fork.snapshot() != state
+
+    # Same inputs from the same state give the same continuation
+    other = aircraft.fork(state)
+    for i in range(20):
+        aircraft.update(0.02, {'thrust': 100})
+        other.update(0.02, {'thrust': 100})
+    assert aircraft.snapshot() == other.snapshot()
+
+
+def test_fork_many_from_records():
+    aircraft = flown_aircraft()
+    states = np.zeros(3, dtype=stader.Aircraft.state_dtype)
+    for i in range(3):
+        aircraft.update(0.02)
+        aircraft.snapshot(states[i])
+    forks = aircraft.fork_many(states)
+    assert len(forks) == 3
+    for fork, state in zip(forks, states):
+        assert fork.snapshot() == state